@@ -1,15 +1,23 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from io import BytesIO
-from fpdf import FPDF
-import plotly.io as pio
-import os
+import hashlib
+import json
+import re
+import threading
 import numpy as np
 
 st.set_page_config(page_title="Excel Data Visualizer", layout="wide")
 
+EXPOSED_RESPONSES = frozenset(['Sí, una vez', 'Sí, varias veces'])
+GROUP_COLORS = ["#ff5733", "#00cc96"]
+ORDINAL_INDICATORS = ["muy", "negativa", "positiva", "nunca", "siempre", "frecuente", "low", "medium", "high", "yes", "no"]
+# Whole-word, case-insensitive match of any indicator in one C-level scan
+ORDINAL_PATTERN = re.compile(r"\b(?:" + "|".join(ORDINAL_INDICATORS) + r")\b", re.IGNORECASE)
+VIEWS = ["📊 Overview", "📈 Insights", "🔄 Explore", "🌟 Profiles", "📉 Impact Analysis"]
+VIEW_WIDGET_KEYS = ["cat_overview", "survey_overview", "comp_survey", "comp_num", "comp_survey_x", "comp_survey_y",
+                    "num_explore", "rel_survey_x", "rel_y", "radar_group", "radar_vars"]
+
 # Custom CSS (unchanged)
 st.markdown("""
 <style>
@@ -33,31 +41,74 @@ st.write("Explore your data with interactive visualizations!")
 
 uploaded_file = st.file_uploader("Upload your Excel file here", type=["xlsx", "xls"], help="Supports .xlsx and .xls formats.")
 
-def detect_survey_columns(df):
+# Bounded caches: each entry pins a frame, figure or export in server memory for every session
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_df(_file, key):
+    file_bytes = _file.getvalue()
+    try:
+        df = pd.read_excel(BytesIO(file_bytes), engine="calamine", dtype_backend="pyarrow")
+    except ImportError:
+        # python-calamine missing: fall back to pandas' default openpyxl reader
+        df = pd.read_excel(BytesIO(file_bytes), dtype_backend="pyarrow")
+    # Likert scales and counts fit in int8/int16, which shrinks every later mask, groupby and hash
+    for col in df.select_dtypes("integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    # Low-cardinality text columns become categoricals so isin/groupby/value_counts work on integer codes
+    max_categories = max(50, 0.05 * len(df))
+    for col in df.columns:
+        is_text = pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])
+        if is_text and df[col].nunique() <= max_categories:
+            df[col] = df[col].astype("category")
+    return df
+
+def observed_categories(series):
+    codes = series.cat.codes.to_numpy()
+    return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def column_summary(_df, key):
+    # One pass per column, shared by the sidebar filters and column detection; categoricals count the
+    # codes actually present, since declared categories (e.g. Group's Control/Exposed) can be empty
+    nunique = pd.Series({col: observed_categories(_df[col]) if _df[col].dtype.name == "category" else _df[col].nunique()
+                         for col in _df.columns})
+    uniques = {col: _df[col].dropna().unique() for col in _df.columns if nunique[col] <= 20}
+    return nunique, uniques
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def detect_survey_columns(_df, key):
+    # Returns the column groups plus the categorical dtypes to apply; the cached frame is never mutated
+    df = _df
+    nunique, uniques = column_summary(df, key)
     numeric_cols = []
     categorical_cols = []
     ordinal_cols = []
+    dtypes = {}
 
     for col in df.columns:
-        if "id" in col.lower() or df[col].nunique() > 0.5 * len(df):
+        if "id" in col.lower() or nunique[col] > 0.5 * len(df):
             continue
 
         if pd.api.types.is_numeric_dtype(df[col]):
-            series = df[col].dropna().astype(float)
-            if series.nunique() > 20 and not series.apply(lambda x: x.is_integer()).all():
+            # One float buffer per column; the sorted uniques give the count, range and ordinal categories
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            distinct = np.unique(values)
+            n_values = distinct.size
+            is_int = bool(np.all(np.mod(values, 1) == 0))
+            if n_values > 20 and not is_int:
                 numeric_cols.append(col)
-            elif series.nunique() <= 10 or (series.min() >= 0 and series.max() <= 10 and series.apply(lambda x: x.is_integer()).all()):
-                df[col] = pd.Categorical(df[col], categories=sorted(series.unique()), ordered=True)
+            elif n_values <= 10 or (distinct[0] >= 0 and distinct[-1] <= 10 and is_int):
+                dtypes[col] = pd.CategoricalDtype(categories=distinct, ordered=True)
                 ordinal_cols.append(col)
             else:
                 numeric_cols.append(col)
 
-        elif pd.api.types.is_object_dtype(df[col]):
-            unique_vals = df[col].nunique()
-            sample_vals = df[col].dropna().unique()
-            ordinal_indicators = ["muy", "negativa", "positiva", "nunca", "siempre", "frecuente", "low", "medium", "high", "yes", "no"]
-            if unique_vals <= 10 and any(ind.lower() in " ".join(str(val).lower() for val in sample_vals) for ind in ordinal_indicators):
-                df[col] = pd.Categorical(df[col], categories=sample_vals, ordered=True)
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            unique_vals = nunique[col]
+            sample_vals = uniques.get(col)
+            if unique_vals <= 10 and ORDINAL_PATTERN.search(" ".join(map(str, sample_vals))):
+                # list() keeps first-seen order; a Categorical would hand over its own (sorted) categories
+                dtypes[col] = pd.CategoricalDtype(categories=list(sample_vals), ordered=True)
                 ordinal_cols.append(col)
             else:
                 categorical_cols.append(col)
@@ -67,26 +118,35 @@ def detect_survey_columns(df):
     if brand_image_col in categorical_cols:
         categorical_cols.remove(brand_image_col)
         ordinal_cols.append(brand_image_col)
-        df[brand_image_col] = pd.Categorical(df[brand_image_col], 
-                                            categories=["Muy negativa", "Negativa", "Neutra", "Positiva", "Muy positiva"], ordered=True)
+        dtypes[brand_image_col] = pd.CategoricalDtype(categories=["Muy negativa", "Negativa", "Neutra", "Positiva", "Muy positiva"],
+                                                      ordered=True)
 
     attribution_col = '[Attribution] Según tu opinión, este anuncio es para:'
     if attribution_col in ordinal_cols:
         ordinal_cols.remove(attribution_col)
         categorical_cols.append(attribution_col)
 
-    return numeric_cols, categorical_cols, ordinal_cols
+    return numeric_cols, categorical_cols, ordinal_cols, dtypes
 
-def calculate_impact_score(df, ad_recall_col, kpi_col):
-    # Step 1: Define control and exposed groups
-    df['Group'] = df[ad_recall_col].apply(lambda x: 'Exposed' if x in ['Sí, una vez', 'Sí, varias veces'] else 'Control')
+def assign_groups(df, ad_recall_col):
+    # Exposed = respondents who recall the ad; one vectorized isin instead of a per-row lambda
+    exposed = df[ad_recall_col].isin(EXPOSED_RESPONSES).to_numpy()
+    df['Group'] = pd.Categorical(np.where(exposed, 'Exposed', 'Control'), categories=['Control', 'Exposed'])
+    return df
+
+def calculate_impact_score(df, kpi_col):
+    # Step 1: Control and exposed groups come from the Group column set by assign_groups;
+    # the KPI is read as raw float64 values and NaNs are skipped like pandas mean/sum would
+    exposed = (df['Group'] == 'Exposed').to_numpy()
+    kpi = df[kpi_col].to_numpy(dtype=np.float64, na_value=np.nan)
 
     # Step 2: Calculate the average KPI for the control group
-    control_avg = df[df['Group'] == 'Control'][kpi_col].mean()
+    control = kpi[~exposed]
+    control = control[~np.isnan(control)]
+    control_avg = control.mean() if control.size else np.nan
 
     # Step 3: Calculate uplift for the exposed group (x_i = KPI value - control group average)
-    exposed_df = df[df['Group'] == 'Exposed'].copy()
-    exposed_df['Uplift'] = exposed_df[kpi_col] - control_avg
+    uplift = kpi[exposed] - control_avg
 
     # Step 4: Use historical benchmarks for Consideration KPI
     # These are placeholder values; replace with actual benchmarks if available
@@ -99,52 +159,97 @@ def calculate_impact_score(df, ad_recall_col, kpi_col):
         return None, "Denominator (x_i_top25 - x_i_flop10) is zero, cannot calculate IS."
 
     # Step 5: Calculate the IS for each respondent in the exposed group
-    exposed_df['IS_Component'] = (exposed_df['Uplift'] - x_i_flop10) / denominator
+    is_component = (uplift - x_i_flop10) / denominator
 
     # Step 6: Sum the IS components and divide by the number of KPIs (n=1), then multiply by 100
     n = 1  # Since we're evaluating only one KPI
-    IS = (exposed_df['IS_Component'].sum() / n) * 100
+    IS = (np.nansum(is_component) / n) * 100
 
     return IS, None
 
-def create_pdf(filtered_df, numeric_cols, categorical_cols, ordinal_cols, figures, impact_score=None, impact_score_error=None):
+def figure_key(fig):
+    # Figures served from st.cache_data are unpickled copies whose layout keys can come back
+    # in a different order, so hash a key-sorted dump rather than the raw to_json() text
+    return hashlib.md5(json.dumps(json.loads(fig.to_json()), sort_keys=True).encode()).hexdigest()
+
+@st.cache_resource(show_spinner=False)
+def png_cache():
+    # PNG bytes by figure-JSON hash, shared across reruns and sessions so unchanged charts are not
+    # rasterized again; the lock lives here too, since module globals are rebuilt on every rerun
+    return {}, threading.Lock()
+
+def render_pngs(figures):
+    # One Chromium session renders the whole batch, a tab per worker; pio.to_image would launch
+    # a browser for every chart. MathJax is off since no chart uses LaTeX, which skips its CDN fetch.
+    import asyncio
+    import kaleido
+
+    async def render(figs):
+        async with kaleido.Kaleido(n=max(1, min(8, len(figs))), mathjax=False) as k:
+            return await asyncio.gather(*(k.calc_fig(fig, opts=dict(format="png", width=800, height=600))
+                                          for fig in figs))
+
+    cache, lock = png_cache()
+    keys = [figure_key(fig) for fig in figures.values()]
+    # Work from a local copy: the shared cache is best-effort and another session may clear it
+    with lock:
+        images = {key: cache[key] for key in keys if key in cache}
+    missing = {key: fig for key, fig in zip(keys, figures.values()) if key not in images}
+    if missing:
+        images.update(zip(missing, asyncio.run(render(list(missing.values())))))
+        with lock:
+            if len(cache) > 256:
+                cache.clear()  # crude bound on memory; a full report is only a dozen charts
+            cache.update((key, images[key]) for key in missing)
+    return [images[key] for key in keys]
+
+def create_pdf(filtered_df, numeric_cols, categorical_cols, ordinal_cols, figures, missing_values, impact_score=None, impact_score_error=None):
+    from fpdf import FPDF, XPos, YPos
+
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
 
     # Title
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Excel Data Visualizer Report", ln=True, align="C")
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, "Excel Data Visualizer Report", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
 
     # Data Overview
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Data Overview", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.cell(0, 6, f"Rows: {filtered_df.shape[0]}", ln=True)
-    pdf.cell(0, 6, f"Columns: {filtered_df.shape[1]}", ln=True)
-    pdf.cell(0, 6, f"Missing Values: {filtered_df.isna().sum().sum()}", ln=True)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Data Overview", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 6, f"Rows: {filtered_df.shape[0]}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.cell(0, 6, f"Columns: {filtered_df.shape[1]}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.cell(0, 6, f"Missing Values: {missing_values}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
     # Group Breakdown
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Group Breakdown", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.cell(0, 6, f"Control Group: {len(filtered_df[filtered_df['Group'] == 'Control'])} respondents", ln=True)
-    pdf.cell(0, 6, f"Exposed Group: {len(filtered_df[filtered_df['Group'] == 'Exposed'])} respondents", ln=True)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Group Breakdown", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 10)
+    # One count over the group codes instead of slicing out each group
+    group_sizes = filtered_df['Group'].value_counts()
+    pdf.cell(0, 6, f"Control Group: {group_sizes['Control']} respondents", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.cell(0, 6, f"Exposed Group: {group_sizes['Exposed']} respondents", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
     # Impact Score
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Impact Score", ln=True)
-    pdf.set_font("Arial", "", 10)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Impact Score", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 10)
     if impact_score is not None:
-        pdf.cell(0, 6, f"Impact Score (IS): {impact_score:.2f}", ln=True)
-        pdf.cell(0, 6, "Note: IS calculated using placeholder benchmarks (flop10=-2, top25=3).", ln=True)
+        pdf.cell(0, 6, f"Impact Score (IS): {impact_score:.2f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.cell(0, 6, "Note: IS calculated using placeholder benchmarks (flop10=-2, top25=3).",
+                 new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     else:
-        pdf.cell(0, 6, f"Impact Score (IS): Not calculated ({impact_score_error})", ln=True)
+        pdf.cell(0, 6, f"Impact Score (IS): Not calculated ({impact_score_error})", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
     # Data Table
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Filtered Data Preview", ln=True)
-    pdf.set_font("Arial", "", 8)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Filtered Data Preview", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 8)
+    # Stringify and clip the preview in one vectorized pass; <U20 truncates each cell to 20 characters
+    preview = filtered_df.head(10).astype("string").fillna("<NA>").to_numpy(dtype="<U20")
+    # Fixed-width cells never wrap, so any column count or header length still fits on the page;
+    # pdf.table() splits the width evenly and fails on wide sheets or long question headers
     col_width = pdf.w / (len(filtered_df.columns) + 1)
     row_height = 6
 
@@ -152,66 +257,508 @@ def create_pdf(filtered_df, numeric_cols, categorical_cols, ordinal_cols, figure
         pdf.cell(col_width, row_height, str(col), border=1)
     pdf.ln(row_height)
 
-    for i, row in filtered_df.head(10).iterrows():
-        for value in row:
-            pdf.cell(col_width, row_height, str(value)[:20], border=1)
+    for row_data in preview.tolist():
+        for value in row_data:
+            pdf.cell(col_width, row_height, value, border=1)
         pdf.ln(row_height)
 
+    images = render_pngs(figures)
+
     # Add Graphs
-    pdf.set_font("Arial", "B", 12)
-    for fig_name, fig in figures.items():
+    pdf.set_font("Helvetica", "B", 12)
+    for fig_name, image in zip(figures, images):
         pdf.add_page()
-        pdf.cell(0, 10, f"Visualization: {fig_name}", ln=True)
-        img_path = f"{fig_name.replace(' ', '_')}.png"
-        pio.write_image(fig, img_path, width=800, height=600)
-        pdf.image(img_path, x=10, y=pdf.get_y() + 5, w=190)
-        os.remove(img_path)  # Clean up temporary file
+        pdf.cell(0, 10, f"Visualization: {fig_name}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.image(BytesIO(image), x=10, y=pdf.get_y() + 5, w=190)
+
+    return bytes(pdf.output())
+
+def filter_signature(file_hash, filters):
+    # Stable key for the uploaded file plus the current sidebar selections
+    items = sorted((col, sorted(map(str, vals))) for col, vals in filters.items())
+    return hashlib.md5(repr((file_hash, items)).encode()).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def count_missing(_df, key):
+    # One boolean block summed once, shared by the metric and the PDF report
+    return int(_df.isna().to_numpy().sum())
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def crosstab_counts(_df, x_col, y_col, key):
+    # 2-D counts from a single bincount over the categorical codes, no object-key hashing
+    x = _df[x_col] if _df[x_col].dtype.name == "category" else _df[x_col].astype("category")
+    y = _df[y_col] if _df[y_col].dtype.name == "category" else _df[y_col].astype("category")
+    x_codes = x.cat.codes.to_numpy().astype(np.int64)
+    y_codes = y.cat.codes.to_numpy().astype(np.int64)
+    valid = (x_codes >= 0) & (y_codes >= 0)
+    nx, ny = len(x.cat.categories), len(y.cat.categories)
+    counts = np.bincount(x_codes[valid] * ny + y_codes[valid], minlength=nx * ny).reshape(nx, ny)
+    # Declared categories with no rows left after filtering get no row/column, like pd.crosstab
+    rows, cols = counts.any(axis=1), counts.any(axis=0)
+    return pd.DataFrame(counts[rows][:, cols], index=x.cat.categories[rows], columns=y.cat.categories[cols])
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def survey_counts(_df, survey_col, weight_col, ordinal, key):
+    ordered = ordinal and _df[survey_col].dtype.name == "category"
+    if weight_col != "None" and weight_col in _df.columns:
+        # Only ordered scales need sorted groups; grouping a categorical with sort=True yields category order
+        return _df.groupby(survey_col, observed=True, sort=ordered)[weight_col].sum().rename("Weighted Count")
+    if ordered:
+        # An unsorted count of a categorical is already in category order
+        counts = _df[survey_col].value_counts(sort=False)
+    else:
+        counts = _df[survey_col].value_counts()
+        counts = counts[counts > 0]  # unordered categoricals also list categories with no rows
+    return counts.rename("Count")
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def apply_filters(_df, _filters, _uniques, key):
+    # One combined mask and a single slice instead of re-slicing the frame per filter
+    mask = np.ones(len(_df), dtype=bool)
+    for col, vals in _filters.items():
+        if len(vals) == len(_uniques[col]):
+            continue  # every value selected
+        mask &= _df[col].isin(vals).to_numpy()
+    return _df[mask]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_pie(_df, cat_col, key):
+    # Slice order does not matter for a pie, so skip the sort by count
+    counts = _df[cat_col].value_counts(sort=False)
+    counts = counts[counts > 0]
+    fig = go.Figure(go.Pie(labels=counts.index.to_numpy(), values=counts.to_numpy()))
+    fig.update_layout(title=f"{cat_col} Breakdown", template="plotly_white",
+                      piecolorway=px.colors.qualitative.Pastel, font=dict(size=12))
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_bar(_df, survey_col, weight_col, ordinal, key):
+    counts = survey_counts(_df, survey_col, weight_col, ordinal, key)
+    # Plot the count Series directly rather than through a reset_index frame
+    fig = go.Figure(go.Bar(x=counts.index.to_numpy(), y=counts.to_numpy(), marker_color="#00cc96"))
+    fig.update_layout(title=f"{survey_col}", template="plotly_white", xaxis_title=survey_col,
+                      yaxis_title=counts.name, xaxis=dict(tickangle=45), font=dict(size=12))
+    return fig
+
+def downsample(data, cap=50000):
+    # Cap the points sent to the browser; the fixed seed keeps reruns stable
+    return data.sample(cap, random_state=0) if len(data) > cap else data
+
+def box_stats(values):
+    # Quartiles and 1.5 IQR whiskers, computed the way plotly would client-side
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    stats = dict(q1=q1, median=median, q3=q3, lowerfence=inside.min(), upperfence=inside.max())
+    return stats, values[(values < stats["lowerfence"]) | (values > stats["upperfence"])]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_box(_df, x_col, y_col, title, colors, key, use_codes=False, color=None):
+    y = _df[y_col]
+    if use_codes:
+        y = y.cat.codes.where(y.notna())
+    elif y.dtype.name == "category" and pd.api.types.is_numeric_dtype(y.cat.categories):
+        y = y.astype(float)
+    if not pd.api.types.is_numeric_dtype(y):
+        # Text answers have no quartiles, plot a capped sample of the raw values
+        fig = px.box(downsample(_df[list(dict.fromkeys([x_col, y_col, color or x_col]))]), x=x_col, y=y_col,
+                     title=title, template="plotly_white", color=color, color_discrete_sequence=colors)
+        fig.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
+        return fig
+
+    # Send precomputed box statistics instead of every sample
+    data = pd.DataFrame({"x": _df[x_col], "y": y.to_numpy(dtype=np.float64, na_value=np.nan),
+                         "trace": _df[color] if color else y_col}).dropna(subset=["y"])
+    sort_x = _df[x_col].dtype.name == "category"
+    fig = go.Figure()
+    for i, (trace_name, trace_data) in enumerate(data.groupby("trace", observed=True, sort=False)):
+        trace_color = colors[i % len(colors)]
+        names, boxes, outliers = [], [], []
+        for name, group in trace_data.groupby("x", observed=True, sort=sort_x)["y"]:
+            stats, out = box_stats(group.to_numpy())
+            names.append(name)
+            boxes.append(stats)
+            outliers.append(pd.DataFrame({"x": [name] * len(out), "y": out}))
+        if not boxes:
+            continue
+        fig.add_trace(go.Box(x=names, name=str(trace_name), marker_color=trace_color, showlegend=bool(color),
+                             **{stat: [box[stat] for box in boxes] for stat in boxes[0]}))
+        outliers = downsample(pd.concat(outliers, ignore_index=True))
+        if len(outliers):
+            fig.add_trace(go.Scatter(x=outliers["x"], y=outliers["y"], mode="markers", name=str(trace_name),
+                                     marker_color=trace_color, showlegend=False))
+    fig.update_layout(title=title, template="plotly_white", xaxis_title=x_col, yaxis_title=y_col,
+                      boxmode="group" if color and color != x_col else "overlay",
+                      xaxis=dict(tickangle=45), font=dict(size=12))
+    return fig
+
+def histogram_edges(values, nbins):
+    # Integer data with few distinct values gets one bin per integer, like plotly's own binning
+    if values.size and np.all(np.mod(values, 1) == 0) and values.max() - values.min() < nbins:
+        return np.arange(values.min(), values.max() + 2) - 0.5
+    return np.histogram_bin_edges(values, bins=nbins)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_histogram(_df, col, title, colors, key, color=None):
+    # Bin server-side so only bar heights are sent to the browser, not every raw value
+    values = _df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    edges = histogram_edges(values[valid], max(1, min(50, _df[col].nunique())))
+    centers = (edges[:-1] + edges[1:]) / 2
+    if color:
+        labels = _df[color].to_numpy()
+        groups = [(name, valid & (labels == name)) for name in _df[color].dropna().unique()]
+    else:
+        groups = [(col, valid)]
+    fig = go.Figure()
+    for i, (name, mask) in enumerate(groups):
+        counts, _ = np.histogram(values[mask], bins=edges)
+        fig.add_trace(go.Bar(x=centers, y=counts, width=np.diff(edges), name=str(name),
+                             marker_color=colors[i % len(colors)], showlegend=bool(color)))
+    fig.update_layout(title=title, template="plotly_white", font=dict(size=12), bargap=0,
+                      xaxis_title=col, yaxis_title="count", legend_title_text=color or "")
+    if color:
+        fig.update_layout(barmode='overlay')
+        fig.update_traces(opacity=0.75)
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_heatmap(_df, x_col, y_col, key):
+    cross_tab = crosstab_counts(_df, x_col, y_col, key)
+    fig = go.Figure(go.Heatmap(z=cross_tab.to_numpy(), x=cross_tab.columns.astype(str), y=cross_tab.index.astype(str),
+                               colorscale="Blues", texttemplate="%{z}"))
+    fig.update_layout(title=f"{x_col} vs {y_col}", template="plotly_white",
+                      xaxis=dict(tickangle=45, title=y_col), yaxis=dict(title=x_col, autorange="reversed"),
+                      font=dict(size=12))
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_radar(_df, group_col, radar_cols, ordinal_cols, key):
+    radar_values = {col: _df[col].cat.codes
+                    if col in ordinal_cols and _df[col].dtype.name == "category"
+                    else _df[col] for col in radar_cols}
+    radar_df = pd.DataFrame({group_col: _df[group_col], **radar_values})
+    agg_data = radar_df.groupby(group_col, observed=True).mean()
+    fig = go.Figure()
+    # Group means as one float matrix; the group labels stay on the index
+    mat = agg_data[radar_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+    theta = radar_cols + [radar_cols[0]]
+    for i, name in enumerate(agg_data.index.to_numpy()):
+        fig.add_trace(go.Scatterpolar(
+            r=np.concatenate([mat[i], mat[i, :1]]),
+            theta=theta,
+            fill='toself',
+            name=name,
+            line=dict(color=px.colors.qualitative.Pastel[i % len(px.colors.qualitative.Pastel)])
+        ))
+    max_val = np.nanmax(mat, initial=0)
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, max(10, max_val)])),
+        showlegend=True, template="plotly_white", font=dict(size=12)
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_group_bar(_df, col, key):
+    counts = _df.groupby(['Group', col], observed=True).size().reset_index(name='Count')
+    fig = px.bar(counts, x=col, y='Count', color='Group',
+                 title=f"{col} by Group",
+                 template="plotly_white",
+                 color_discrete_sequence=GROUP_COLORS,
+                 barmode='group')
+    fig.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_group_share(_df, col, key):
+    counts = _df.groupby(['Group', col], observed=True).size().reset_index(name='Count')
+    counts['Percentage'] = counts.groupby('Group', observed=True)['Count'].transform(lambda x: x / x.sum() * 100)
+    fig = px.bar(counts, x='Group', y='Percentage', color=col,
+                 title=f"{col} by Group (Percentage)",
+                 template="plotly_white",
+                 color_discrete_sequence=px.colors.qualitative.Pastel)
+    fig.update_layout(font=dict(size=12))
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_group_trend(_df, x_col, x_order, y_col, title, key):
+    # Order the x axis without mutating the (cached) filtered frame
+    x = pd.Series(pd.Categorical(_df[x_col], categories=x_order, ordered=True), index=_df.index, name=x_col)
+    trend = _df.groupby(['Group', x], observed=True)[y_col].mean().reset_index()
+    fig = px.line(trend, x=x_col, y=y_col, color='Group',
+                  title=title,
+                  template="plotly_white",
+                  color_discrete_sequence=GROUP_COLORS)
+    fig.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
+    return fig
+
+def remembered(key, options):
+    # Last value picked in a view that is not on screen, falling back to the widget default
+    if not options:
+        return None
+    value = st.session_state.get(key)
+    return value if value in options else options[0]
+
+def overview_figures(filtered_df, filter_hash, ordinal_cols, weight_col, cat_col, survey_col):
+    figures = {}
+    if cat_col:
+        figures["Overview Pie Chart"] = build_pie(filtered_df, cat_col, filter_hash)
+    if survey_col:
+        figures["Overview Bar Chart"] = build_bar(filtered_df, survey_col, weight_col, survey_col in ordinal_cols, filter_hash)
+    return figures
+
+def insights_figures(filtered_df, filter_hash, survey_x, num_y, survey_x2, survey_y2):
+    figures = {}
+    if survey_x and num_y:
+        figures["Insights Box Plot"] = build_box(filtered_df, survey_x, num_y, f"{num_y} by {survey_x}", ["#ff5733"], filter_hash)
+    if survey_x2 and survey_y2:
+        figures["Insights Heatmap"] = build_heatmap(filtered_df, survey_x2, survey_y2, filter_hash)
+    return figures
+
+def explore_figures(filtered_df, filter_hash, numeric_cols, ordinal_cols, num_col, survey_x, y_col):
+    figures = {}
+    if num_col:
+        figures["Explore Histogram"] = build_histogram(filtered_df, num_col, f"{num_col} Distribution", ["#0078d4"], filter_hash)
+    if survey_x and y_col:
+        if y_col in numeric_cols:
+            figures["Explore Box Plot"] = build_box(filtered_df, survey_x, y_col, f"{y_col} by {survey_x}", ["#ab63fa"], filter_hash)
+        else:
+            use_codes = y_col in ordinal_cols and filtered_df[y_col].dtype.name == "category"
+            figures["Explore Box Plot"] = build_box(filtered_df, survey_x, y_col,
+                                                    f"{y_col} {'(codes)' if y_col in ordinal_cols else ''} by {survey_x}",
+                                                    ["#ab63fa"], filter_hash, use_codes=use_codes)
+    return figures
+
+def profiles_figures(filtered_df, filter_hash, ordinal_cols, group_col, radar_cols):
+    if group_col and len(radar_cols) >= 2:
+        return {"Profiles Radar Chart": build_radar(filtered_df, group_col, radar_cols, ordinal_cols, filter_hash)}
+    return {}
+
+def impact_figures(filtered_df, filter_hash, kpi_col):
+    brand_image_col = '[Brand image] Este es un anuncio de Coca Cola. ¿Qué imagen te da de Coca Cola?'
+    attribution_col = '[Attribution] Según tu opinión, este anuncio es para:'
+    interest_col = '[Interest] ¿Te interesa este anuncio?'
+    age_col = '[Profiling] ¿Qué edad tienes?'
+    age_order = ['18-24 años', '25-34 años', '35-44 años', '45-54 años', '55-64 años', '65 años o más']
+    return {
+        "Impact Box Plot - Consideration": build_box(filtered_df, 'Group', kpi_col, f"{kpi_col} by Group",
+                                                     GROUP_COLORS, filter_hash, color='Group'),
+        "Impact Histogram - Consideration": build_histogram(filtered_df, kpi_col, f"{kpi_col} Distribution by Group",
+                                                            GROUP_COLORS, filter_hash, color='Group'),
+        "Impact Bar Chart - Brand Image": build_group_bar(filtered_df, brand_image_col, filter_hash),
+        "Impact Stacked Bar Chart - Attribution": build_group_share(filtered_df, attribution_col, filter_hash),
+        "Impact Box Plot - Interest": build_box(filtered_df, 'Group', interest_col, f"{interest_col} by Group",
+                                                GROUP_COLORS, filter_hash, color='Group'),
+        "Impact Line Chart - Consideration by Age": build_group_trend(filtered_df, age_col, age_order, kpi_col,
+                                                                      f"Average {kpi_col} by Age Group", filter_hash),
+    }
 
-    pdf_output = BytesIO()
-    pdf_output.write(pdf.output(dest='S').encode('latin1'))
-    pdf_output.seek(0)
-    return pdf_output
+def report_figures(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols, weight_col, kpi_col):
+    # Every view's charts for the PDF, built with the selections last made in each view
+    survey_cols = ordinal_cols + categorical_cols
+    survey_x2 = remembered("comp_survey_x", survey_cols)
+    rel_x = remembered("rel_survey_x", survey_cols)
+    radar_options = numeric_cols + ordinal_cols
+    radar_cols = [col for col in st.session_state.get("radar_vars", radar_options[:3]) if col in radar_options]
+
+    figures = {}
+    figures.update(overview_figures(filtered_df, filter_hash, ordinal_cols, weight_col,
+                                    remembered("cat_overview", categorical_cols),
+                                    remembered("survey_overview", survey_cols)))
+    figures.update(insights_figures(filtered_df, filter_hash,
+                                    remembered("comp_survey", survey_cols), remembered("comp_num", numeric_cols),
+                                    survey_x2, remembered("comp_survey_y", [col for col in survey_cols if col != survey_x2])))
+    figures.update(explore_figures(filtered_df, filter_hash, numeric_cols, ordinal_cols,
+                                   remembered("num_explore", numeric_cols), rel_x,
+                                   remembered("rel_y", numeric_cols + [col for col in survey_cols if col != rel_x])))
+    figures.update(profiles_figures(filtered_df, filter_hash, ordinal_cols,
+                                    remembered("radar_group", categorical_cols), radar_cols))
+    figures.update(impact_figures(filtered_df, filter_hash, kpi_col))
+    return figures
+
+def render_overview(filtered_df, filter_hash, categorical_cols, ordinal_cols, weight_col):
+    st.subheader("Overview")
+    col1, col2 = st.columns(2)
+    survey_cols = ordinal_cols + categorical_cols
+
+    with col1:
+        cat_col = st.selectbox("Categorical Data", categorical_cols, key="cat_overview") if categorical_cols else None
+    with col2:
+        survey_col = st.selectbox("Survey Responses", survey_cols, key="survey_overview") if survey_cols else None
+    figures = overview_figures(filtered_df, filter_hash, ordinal_cols, weight_col, cat_col, survey_col)
+
+    with col1:
+        if cat_col:
+            st.plotly_chart(figures["Overview Pie Chart"], use_container_width=True, key="overview_pie_chart")
+        else:
+            st.info("No categorical columns available.")
+    with col2:
+        if survey_col:
+            st.plotly_chart(figures["Overview Bar Chart"], use_container_width=True, key="overview_bar_chart")
+        else:
+            st.info("No survey-like columns available.")
+
+def render_insights(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols):
+    st.subheader("Insights")
+    col1, col2 = st.columns(2)
+    survey_cols = ordinal_cols + categorical_cols
+    survey_x = num_y = survey_x2 = survey_y2 = None
+
+    with col1:
+        if survey_cols and numeric_cols:
+            survey_x = st.selectbox("Survey Question (X)", survey_cols, key="comp_survey")
+            num_y = st.selectbox("Numeric (Y)", numeric_cols, key="comp_num")
+    with col2:
+        if len(survey_cols) >= 2:
+            survey_x2 = st.selectbox("Survey Question (X-axis)", survey_cols, key="comp_survey_x")
+            survey_y2 = st.selectbox("Survey Question (Y-axis)", 
+                                   [col for col in survey_cols if col != survey_x2], key="comp_survey_y")
+    figures = insights_figures(filtered_df, filter_hash, survey_x, num_y, survey_x2, survey_y2)
+
+    with col1:
+        if "Insights Box Plot" in figures:
+            st.plotly_chart(figures["Insights Box Plot"], use_container_width=True, key="insights_box_chart")
+        else:
+            st.info("Need survey and numeric columns for insights.")
+    with col2:
+        if "Insights Heatmap" in figures:
+            st.plotly_chart(figures["Insights Heatmap"], use_container_width=True, key="insights_heatmap_chart")
+        else:
+            st.info("Need at least two survey columns for heatmap.")
+
+def render_explore(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols):
+    st.subheader("Explore Relationships")
+    col1, col2 = st.columns(2)
+    survey_cols = ordinal_cols + categorical_cols
+    num_col = survey_x = y_col = None
+
+    with col1:
+        if numeric_cols:
+            num_col = st.selectbox("Numeric Data", numeric_cols, key="num_explore")
+    with col2:
+        if survey_cols and (numeric_cols or len(survey_cols) >= 2):
+            survey_x = st.selectbox("Survey Question", survey_cols, key="rel_survey_x")
+            y_options = numeric_cols + [col for col in survey_cols if col != survey_x]
+            y_col = st.selectbox("Y-Axis (Numeric or Survey)", y_options, key="rel_y")
+    figures = explore_figures(filtered_df, filter_hash, numeric_cols, ordinal_cols, num_col, survey_x, y_col)
+
+    with col1:
+        if "Explore Histogram" in figures:
+            st.plotly_chart(figures["Explore Histogram"], use_container_width=True, key="explore_hist_chart")
+        else:
+            st.info("No numeric columns available.")
+    with col2:
+        if "Explore Box Plot" in figures:
+            st.plotly_chart(figures["Explore Box Plot"], use_container_width=True, key="explore_box_chart")
+        else:
+            st.info("Need survey and numeric/survey columns.")
+
+def render_profiles(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols):
+    st.subheader("Profiles")
+    survey_cols = numeric_cols + ordinal_cols
+    if len(survey_cols) >= 2 and categorical_cols:
+        group_col = st.selectbox("Group By", categorical_cols, key="radar_group")
+        # The kept session value wins over the default once the widget has been used
+        radar_cols = st.multiselect("Select Variables (2+)", survey_cols, 
+                                  default=None if "radar_vars" in st.session_state else survey_cols[:min(3, len(survey_cols))], 
+                                  key="radar_vars")
+        figures = profiles_figures(filtered_df, filter_hash, ordinal_cols, group_col, radar_cols)
+        if figures:
+            st.plotly_chart(figures["Profiles Radar Chart"], use_container_width=True, key="profiles_radar_chart")
+        else:
+            st.info("Select at least 2 numeric or ordinal variables for radar chart.")
+    else:
+        st.info("Need at least 2 numeric/ordinal columns and 1 categorical column for radar charts.")
+
+def render_impact(filtered_df, filter_hash, kpi_col):
+    st.subheader("Impact Analysis: Control vs Exposed Groups")
+    figures = impact_figures(filtered_df, filter_hash, kpi_col)
+
+    # Graphs 1-2: Box Plot and Histogram for Consideration KPI
+    st.write("### Consideration KPI Distribution")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(figures["Impact Box Plot - Consideration"], use_container_width=True, key="impact_box_chart")
+    with col2:
+        st.plotly_chart(figures["Impact Histogram - Consideration"], use_container_width=True, key="impact_hist_chart")
+
+    # Graph 3: Bar Chart for Brand Image
+    st.write("### Brand Image Perception")
+    st.plotly_chart(figures["Impact Bar Chart - Brand Image"], use_container_width=True, key="impact_brand_image_chart")
+
+    # Graph 4: Stacked Bar Chart for Attribution
+    st.write("### Attribution of the Ad")
+    st.plotly_chart(figures["Impact Stacked Bar Chart - Attribution"], use_container_width=True, key="impact_attribution_chart")
+
+    # Graph 5: Box Plot for Interest
+    st.write("### Interest in the Ad")
+    st.plotly_chart(figures["Impact Box Plot - Interest"], use_container_width=True, key="impact_interest_chart")
+
+    # Graph 6: Line Chart for Consideration by Age Group
+    st.write("### Consideration by Age Group")
+    st.plotly_chart(figures["Impact Line Chart - Consideration by Age"], use_container_width=True, key="impact_age_consideration_chart")
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def to_csv_bytes(_df, key):
+    # pandas writes encoded bytes straight into the buffer, no intermediate str copy of the whole file
+    buf = BytesIO()
+    _df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def to_pdf_bytes(_df, numeric_cols, categorical_cols, ordinal_cols, _figures, missing_values, impact_score, impact_score_error, key):
+    return create_pdf(_df, numeric_cols, categorical_cols, ordinal_cols, _figures, missing_values, impact_score, impact_score_error)
 
 if uploaded_file:
+    # Plotting libraries are only needed once there is data, keep them off the landing page
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     with st.spinner("Processing your file..."):
         try:
-            df = pd.read_excel(uploaded_file)
+            # Hash the upload once per file; later reruns reuse the content key instead of re-reading the bytes
+            if st.session_state.get("file_id") != uploaded_file.file_id:
+                st.session_state["file_id"] = uploaded_file.file_id
+                st.session_state["file_hash"] = hashlib.md5(uploaded_file.getvalue()).hexdigest()
+            file_hash = st.session_state["file_hash"]
+            df = load_df(uploaded_file, file_hash)
             st.success("File uploaded successfully!")
 
             # Define control and exposed groups
             ad_recall_col = '[Ad recall] ¿Recuerda haber visto este anuncio en un cartel digital?'
-            df['Group'] = df[ad_recall_col].apply(lambda x: 'Exposed' if x in ['Sí, una vez', 'Sí, varias veces'] else 'Control')
+            df = assign_groups(df, ad_recall_col)
 
             with st.sidebar:
                 st.header("Controls")
                 with st.expander("Filters", expanded=True):
-                    filterable_cols = [col for col in df.columns if df[col].nunique() <= 20]
+                    nunique, uniques = column_summary(df, file_hash)
                     filters = {}
-                    for col in filterable_cols:
-                        unique_vals = df[col].dropna().unique()
+                    for col, unique_vals in uniques.items():
                         selected_vals = st.multiselect(f"{col}", unique_vals, default=unique_vals, key=f"filter_{col}")
                         filters[col] = selected_vals
                     if st.button("Reset Filters"):
                         st.rerun()
 
-                numeric_cols, categorical_cols, ordinal_cols = detect_survey_columns(df)
+                numeric_cols, categorical_cols, ordinal_cols, survey_dtypes = detect_survey_columns(df, file_hash)
+                df = df.astype(survey_dtypes)
                 weight_options = ["None"] + numeric_cols
                 weight_col = st.selectbox("Apply weights (optional)", weight_options, index=0, 
                                         help="Choose a numeric column to weight the data.")
 
-            filtered_df = df.copy()
-            for col, vals in filters.items():
-                filtered_df = filtered_df[filtered_df[col].isin(vals)]
+            filter_hash = filter_signature(file_hash, filters)
+            filtered_df = apply_filters(df, filters, uniques, filter_hash)
             if filtered_df.empty:
                 st.warning("Filters resulted in no data. Showing full dataset instead.")
-                filtered_df = df.copy()
+                filtered_df = df  # nothing downstream mutates the frame, so no copy is needed
 
             st.subheader("Data Overview", anchor="overview")
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Rows", filtered_df.shape[0])
             col2.metric("Columns", filtered_df.shape[1])
-            col3.metric("Missing Values", filtered_df.isna().sum().sum())
-            col4.metric("Exposed Group", len(filtered_df[filtered_df['Group'] == 'Exposed']))
+            missing_values = count_missing(filtered_df, filter_hash)
+            col3.metric("Missing Values", missing_values)
+            col4.metric("Exposed Group", int(filtered_df['Group'].value_counts()['Exposed']))
 
             with st.expander("View Data Preview"):
                 st.dataframe(filtered_df.head())
@@ -222,7 +769,7 @@ if uploaded_file:
 
             # Calculate Impact Score for the Consideration KPI
             kpi_col = '[Consideration] ¿En el futuro considerarías comprar Coca Cola?'
-            impact_score, impact_score_error = calculate_impact_score(filtered_df, ad_recall_col, kpi_col)
+            impact_score, impact_score_error = calculate_impact_score(filtered_df, kpi_col)
 
             st.subheader("Impact Score Analysis")
             if impact_score is not None:
@@ -231,243 +778,41 @@ if uploaded_file:
             else:
                 st.error(f"Could not calculate Impact Score: {impact_score_error}")
 
-            # Store figures for PDF
-            figures = {}
-
-            tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "📈 Insights", "🔄 Explore", "🌟 Profiles", "📉 Impact Analysis"])
-
-            with tab1:
-                st.subheader("Overview")
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    if categorical_cols:
-                        cat_col = st.selectbox("Categorical Data", categorical_cols, key="cat_overview")
-                        counts = filtered_df[cat_col].value_counts().reset_index()
-                        counts.columns = [cat_col, "Count"]
-                        fig_pie = px.pie(counts, names=cat_col, values="Count", title=f"{cat_col} Breakdown",
-                                       template="plotly_white", color_discrete_sequence=px.colors.qualitative.Pastel)
-                        fig_pie.update_layout(font=dict(size=12))
-                        st.plotly_chart(fig_pie, use_container_width=True, key="overview_pie_chart")
-                        figures["Overview Pie Chart"] = fig_pie
-                    else:
-                        st.info("No categorical columns available.")
-
-                with col2:
-                    survey_cols = ordinal_cols + categorical_cols
-                    if survey_cols:
-                        survey_col = st.selectbox("Survey Responses", survey_cols, key="survey_overview")
-                        if weight_col != "None" and weight_col in filtered_df.columns:
-                            counts = filtered_df.groupby(survey_col, observed=True)[weight_col].sum().reset_index()
-                            counts.columns = [survey_col, "Weighted Count"]
-                        else:
-                            counts = filtered_df[survey_col].value_counts().reset_index()
-                            counts.columns = [survey_col, "Count"]
-                        if survey_col in ordinal_cols and filtered_df[survey_col].dtype.name == "category":
-                            counts[survey_col] = pd.Categorical(counts[survey_col], 
-                                                              categories=filtered_df[survey_col].cat.categories, ordered=True)
-                            counts = counts.sort_values(survey_col)
-                        fig_bar = px.bar(counts, x=survey_col, y=counts.columns[1], title=f"{survey_col}",
-                                       template="plotly_white", color_discrete_sequence=["#00cc96"])
-                        fig_bar.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                        st.plotly_chart(fig_bar, use_container_width=True, key="overview_bar_chart")
-                        figures["Overview Bar Chart"] = fig_bar
-                    else:
-                        st.info("No survey-like columns available.")
-
-            with tab2:
-                st.subheader("Insights")
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    survey_cols = ordinal_cols + categorical_cols
-                    if survey_cols and numeric_cols:
-                        survey_x = st.selectbox("Survey Question (X)", survey_cols, key="comp_survey")
-                        num_y = st.selectbox("Numeric (Y)", numeric_cols, key="comp_num")
-                        fig_box = px.box(filtered_df, x=survey_x, y=num_y, title=f"{num_y} by {survey_x}",
-                                       template="plotly_white", color_discrete_sequence=["#ff5733"])
-                        fig_box.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                        st.plotly_chart(fig_box, use_container_width=True, key="insights_box_chart")
-                        figures["Insights Box Plot"] = fig_box
-                    else:
-                        st.info("Need survey and numeric columns for insights.")
-
-                with col2:
-                    if len(survey_cols) >= 2:
-                        survey_x2 = st.selectbox("Survey Question (X-axis)", survey_cols, key="comp_survey_x")
-                        survey_y2 = st.selectbox("Survey Question (Y-axis)", 
-                                               [col for col in survey_cols if col != survey_x2], key="comp_survey_y")
-                        cross_tab = pd.crosstab(filtered_df[survey_x2], filtered_df[survey_y2])
-                        fig_heatmap = px.imshow(cross_tab, text_auto=True, aspect="auto",
-                                              title=f"{survey_x2} vs {survey_y2}", 
-                                              color_continuous_scale="Blues", template="plotly_white")
-                        fig_heatmap.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                        st.plotly_chart(fig_heatmap, use_container_width=True, key="insights_heatmap_chart")
-                        figures["Insights Heatmap"] = fig_heatmap
-                    else:
-                        st.info("Need at least two survey columns for heatmap.")
-
-            with tab3:
-                st.subheader("Explore Relationships")
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    if numeric_cols:
-                        num_col = st.selectbox("Numeric Data", numeric_cols, key="num_explore")
-                        fig_hist = px.histogram(filtered_df, x=num_col, title=f"{num_col} Distribution",
-                                              template="plotly_white", color_discrete_sequence=["#0078d4"],
-                                              nbins=min(50, filtered_df[num_col].nunique()))
-                        fig_hist.update_layout(font=dict(size=12))
-                        st.plotly_chart(fig_hist, use_container_width=True, key="explore_hist_chart")
-                        figures["Explore Histogram"] = fig_hist
-                    else:
-                        st.info("No numeric columns available.")
-
-                with col2:
-                    survey_cols = ordinal_cols + categorical_cols
-                    if survey_cols and (numeric_cols or len(survey_cols) >= 2):
-                        survey_x = st.selectbox("Survey Question", survey_cols, key="rel_survey_x")
-                        y_options = numeric_cols + [col for col in survey_cols if col != survey_x]
-                        y_col = st.selectbox("Y-Axis (Numeric or Survey)", y_options, key="rel_y")
-                        if y_col in numeric_cols:
-                            fig_rel = px.box(filtered_df, x=survey_x, y=y_col, title=f"{y_col} by {survey_x}",
-                                           template="plotly_white", color_discrete_sequence=["#ab63fa"])
-                        else:
-                            y_data = filtered_df[y_col].cat.codes if y_col in ordinal_cols and filtered_df[y_col].dtype.name == "category" else filtered_df[y_col]
-                            fig_rel = px.box(filtered_df, x=survey_x, y=y_data, 
-                                           title=f"{y_col} {'(codes)' if y_col in ordinal_cols else ''} by {survey_x}",
-                                           template="plotly_white", color_discrete_sequence=["#ab63fa"])
-                        fig_rel.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                        st.plotly_chart(fig_rel, use_container_width=True, key="explore_box_chart")
-                        figures["Explore Box Plot"] = fig_rel
-                    else:
-                        st.info("Need survey and numeric/survey columns.")
-
-            with tab4:
-                st.subheader("Profiles")
-                survey_cols = numeric_cols + ordinal_cols
-                if len(survey_cols) >= 2 and categorical_cols:
-                    group_col = st.selectbox("Group By", categorical_cols, key="radar_group")
-                    radar_cols = st.multiselect("Select Variables (2+)", survey_cols, 
-                                              default=survey_cols[:min(3, len(survey_cols))], 
-                                              key="radar_vars")
-                    if len(radar_cols) >= 2:
-                        radar_df = filtered_df.copy()
-                        for col in radar_cols:
-                            if col in ordinal_cols and radar_df[col].dtype.name == "category":
-                                radar_df[col] = radar_df[col].cat.codes
-                        agg_data = radar_df.groupby(group_col)[radar_cols].mean().reset_index()
-                        fig_radar = go.Figure()
-                        for i, row in agg_data.iterrows():
-                            values = [row[col] for col in radar_cols]
-                            fig_radar.add_trace(go.Scatterpolar(
-                                r=values + [values[0]],
-                                theta=radar_cols + [radar_cols[0]],
-                                fill='toself',
-                                name=row[group_col],
-                                line=dict(color=px.colors.qualitative.Pastel[i % len(px.colors.qualitative.Pastel)])
-                            ))
-                        max_val = agg_data[radar_cols].max().max()
-                        fig_radar.update_layout(
-                            polar=dict(radialaxis=dict(visible=True, range=[0, max(10, max_val)])),
-                            showlegend=True, template="plotly_white", font=dict(size=12)
-                        )
-                        st.plotly_chart(fig_radar, use_container_width=True, key="profiles_radar_chart")
-                        figures["Profiles Radar Chart"] = fig_radar
-                    else:
-                        st.info("Select at least 2 numeric or ordinal variables for radar chart.")
-                else:
-                    st.info("Need at least 2 numeric/ordinal columns and 1 categorical column for radar charts.")
-
-            with tab5:
-                st.subheader("Impact Analysis: Control vs Exposed Groups")
-
-                # Graph 1: Box Plot for Consideration KPI
-                st.write("### Consideration KPI Distribution")
-                col1, col2 = st.columns(2)
-                with col1:
-                    fig_box_impact = px.box(filtered_df, x='Group', y=kpi_col,
-                                            title=f"{kpi_col} by Group",
-                                            template="plotly_white", color='Group',
-                                            color_discrete_sequence=["#ff5733", "#00cc96"])
-                    fig_box_impact.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                    st.plotly_chart(fig_box_impact, use_container_width=True, key="impact_box_chart")
-                    figures["Impact Box Plot - Consideration"] = fig_box_impact
-
-                # Graph 2: Histogram for Consideration KPI
-                with col2:
-                    fig_hist_impact = px.histogram(filtered_df, x=kpi_col, color='Group',
-                                                  title=f"{kpi_col} Distribution by Group",
-                                                  template="plotly_white",
-                                                  color_discrete_sequence=["#ff5733", "#00cc96"],
-                                                  nbins=min(50, filtered_df[kpi_col].nunique()))
-                    fig_hist_impact.update_layout(font=dict(size=12), barmode='overlay')
-                    fig_hist_impact.update_traces(opacity=0.75)
-                    st.plotly_chart(fig_hist_impact, use_container_width=True, key="impact_hist_chart")
-                    figures["Impact Histogram - Consideration"] = fig_hist_impact
-
-                # Graph 3: Bar Chart for Brand Image
-                st.write("### Brand Image Perception")
-                brand_image_col = '[Brand image] Este es un anuncio de Coca Cola. ¿Qué imagen te da de Coca Cola?'
-                brand_image_counts = filtered_df.groupby(['Group', brand_image_col], observed=True).size().reset_index(name='Count')
-                fig_brand_image = px.bar(brand_image_counts, x=brand_image_col, y='Count', color='Group',
-                                        title=f"{brand_image_col} by Group",
-                                        template="plotly_white",
-                                        color_discrete_sequence=["#ff5733", "#00cc96"],
-                                        barmode='group')
-                fig_brand_image.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                st.plotly_chart(fig_brand_image, use_container_width=True, key="impact_brand_image_chart")
-                figures["Impact Bar Chart - Brand Image"] = fig_brand_image
-
-                # Graph 4: Stacked Bar Chart for Attribution
-                st.write("### Attribution of the Ad")
-                attribution_col = '[Attribution] Según tu opinión, este anuncio es para:'
-                attribution_counts = filtered_df.groupby(['Group', attribution_col], observed=True).size().reset_index(name='Count')
-                attribution_counts['Percentage'] = attribution_counts.groupby('Group')['Count'].transform(lambda x: x / x.sum() * 100)
-                fig_attribution = px.bar(attribution_counts, x='Group', y='Percentage', color=attribution_col,
-                                        title=f"{attribution_col} by Group (Percentage)",
-                                        template="plotly_white",
-                                        color_discrete_sequence=px.colors.qualitative.Pastel)
-                fig_attribution.update_layout(font=dict(size=12))
-                st.plotly_chart(fig_attribution, use_container_width=True, key="impact_attribution_chart")
-                figures["Impact Stacked Bar Chart - Attribution"] = fig_attribution
-
-                # Graph 5: Box Plot for Interest
-                st.write("### Interest in the Ad")
-                interest_col = '[Interest] ¿Te interesa este anuncio?'
-                fig_interest = px.box(filtered_df, x='Group', y=interest_col,
-                                     title=f"{interest_col} by Group",
-                                     template="plotly_white", color='Group',
-                                     color_discrete_sequence=["#ff5733", "#00cc96"])
-                fig_interest.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                st.plotly_chart(fig_interest, use_container_width=True, key="impact_interest_chart")
-                figures["Impact Box Plot - Interest"] = fig_interest
-
-                # Graph 6: Line Chart for Consideration by Age Group
-                st.write("### Consideration by Age Group")
-                age_col = '[Profiling] ¿Qué edad tienes?'
-                age_order = ['18-24 años', '25-34 años', '35-44 años', '45-54 años', '55-64 años', '65 años o más']
-                filtered_df[age_col] = pd.Categorical(filtered_df[age_col], categories=age_order, ordered=True)
-                age_consideration = filtered_df.groupby(['Group', age_col], observed=True)[kpi_col].mean().reset_index()
-                fig_age_consideration = px.line(age_consideration, x=age_col, y=kpi_col, color='Group',
-                                               title=f"Average {kpi_col} by Age Group",
-                                               template="plotly_white",
-                                               color_discrete_sequence=["#ff5733", "#00cc96"])
-                fig_age_consideration.update_layout(xaxis=dict(tickangle=45), font=dict(size=12))
-                st.plotly_chart(fig_age_consideration, use_container_width=True, key="impact_age_consideration_chart")
-                figures["Impact Line Chart - Consideration by Age"] = fig_age_consideration
+            # Only the selected view is built; hidden views keep their selections across reruns
+            for key in VIEW_WIDGET_KEYS:
+                if key in st.session_state:
+                    st.session_state[key] = st.session_state[key]
+            active_view = st.radio("View", VIEWS, horizontal=True, key="active_view", label_visibility="collapsed")
+
+            if active_view == "📊 Overview":
+                render_overview(filtered_df, filter_hash, categorical_cols, ordinal_cols, weight_col)
+            elif active_view == "📈 Insights":
+                render_insights(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols)
+            elif active_view == "🔄 Explore":
+                render_explore(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols)
+            elif active_view == "🌟 Profiles":
+                render_profiles(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols)
+            else:
+                render_impact(filtered_df, filter_hash, kpi_col)
 
             st.subheader("Download Your Data")
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("Download as CSV", help="Save the filtered data as a CSV file"):
-                    csv = filtered_df.to_csv(index=False)
-                    st.download_button(label="Download CSV", data=csv, file_name="processed_data.csv", mime="text/csv")
+                # A callable defers the CSV encoding until the button is actually clicked
+                st.download_button(label="Download as CSV", data=lambda: to_csv_bytes(filtered_df, filter_hash),
+                                   file_name="processed_data.csv", mime="text/csv", on_click="ignore",
+                                   help="Save the filtered data as a CSV file")
             with col2:
+                # Kaleido export is too slow for every rerun: build on request, cache per filter/figure state
                 if st.button("Download as PDF", help="Save data and graphs as a PDF"):
                     with st.spinner("Generating PDF with graphs..."):
-                        pdf_output = create_pdf(filtered_df, numeric_cols, categorical_cols, ordinal_cols, figures, impact_score, impact_score_error)
-                        st.download_button(label="Download PDF", data=pdf_output, file_name="processed_data_with_graphs.pdf", mime="application/pdf")
+                        figures = report_figures(filtered_df, filter_hash, numeric_cols, categorical_cols, ordinal_cols,
+                                                 weight_col, kpi_col)
+                        figures_hash = hashlib.md5("".join(map(figure_key, figures.values())).encode()).hexdigest()
+                        pdf_bytes = to_pdf_bytes(filtered_df, numeric_cols, categorical_cols, ordinal_cols, figures,
+                                                 missing_values, impact_score, impact_score_error, (filter_hash, figures_hash))
+                        st.download_button(label="Download PDF", data=pdf_bytes, file_name="processed_data_with_graphs.pdf", mime="application/pdf",
+                                           on_click="ignore")
 
         except Exception as e:
             st.error(f"Error processing file: {e}")